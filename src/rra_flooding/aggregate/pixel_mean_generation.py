@@ -1,4 +1,5 @@
-import pandas as pd # type: ignore
+import pyarrow as pa # type: ignore
+import pyarrow.parquet as pq # type: ignore
 from pathlib import Path
 import numpy as np # type: ignore
 from rra_flooding.data import FloodingData
@@ -46,34 +47,89 @@ def create_mean_results(hierarchy: str, scenario: str, variant: str) -> None:
     ]
     # models = ["GFDL-CM4"] # remove becuase not in ssp126
 
-    df_list = []
+    key_cols = ["location_id", "year_id", "scenario", "variant"]
+    value_cols = ["people_flood_days", "people_flood_days_per_capita", "population"]
+
+    tables = []
 
     for model in models:
         file_name = f"{summary_variable}_{scenario}_{model}_{variant}.parquet"
         file_path = root / file_name
         if not file_path.exists():
-            continue 
-        
-        df = pd.read_parquet(file_path)
-        df_list.append(df)
-
-    if not df_list:
-        return 
-
-    combined_df = pd.concat(df_list, ignore_index=True)
-    combined_df["model"] = "mean"
-
-    combined_df = combined_df.groupby(
-        ["location_id", "year_id", "model", "scenario", "variant"]
-    ).agg({
-        "people_flood_days": "mean", 
-        "people_flood_days_per_capita": "mean",
-        "population": "mean"
-    }).reset_index()
-
-    # Save the aggregated mean results
+            continue
+
+        # Project just the needed columns in the reader (parquet is
+        # columnar, so everything else is never decoded) and keep the
+        # data in arrow: string columns stay dictionary-encoded rather
+        # than blowing up into one Python object per row
+        table = pq.read_table(file_path, columns=key_cols + value_cols)
+        # Sort on location/year only: scenario and variant are
+        # single-valued within a file, and their dictionary-typed columns
+        # can't be sort keys on pyarrow 19 anyway
+        tables.append(
+            table.sort_by([("location_id", "ascending"), ("year_id", "ascending")])
+        )
+
+    if not tables:
+        return
+
+    def model_column(n: int) -> pa.DictionaryArray:
+        # A constant dictionary column costs one string plus n int8 codes
+        return pa.DictionaryArray.from_arrays(
+            pa.array(np.zeros(n, dtype=np.int8)), pa.array(["mean"])
+        )
+
+    # Every model file carries the same (location, year, scenario, variant)
+    # rows, so after sorting, the cross-model mean is a stacked nanmean over
+    # aligned arrays — no hash groupby over the concatenated tables needed.
+    base_keys = tables[0].select(key_cols)
+    aligned = all(t.select(key_cols).equals(base_keys) for t in tables[1:])
+    if aligned:
+        stacked = np.stack([
+            np.column_stack([
+                t.column(c).to_numpy(zero_copy_only=False) for c in value_cols
+            ])
+            for t in tables
+        ])
+        means = np.nanmean(stacked, axis=0)
+        combined = pa.table({
+            "location_id": base_keys.column("location_id"),
+            "year_id": base_keys.column("year_id"),
+            "model": model_column(len(base_keys)),
+            "scenario": base_keys.column("scenario"),
+            "variant": base_keys.column("variant"),
+            **{c: means[:, j] for j, c in enumerate(value_cols)},
+        })
+    else:
+        # A model is missing rows; fall back to a hash aggregation, still
+        # in arrow so the string key columns never materialize as objects
+        grouped = (
+            pa.concat_tables(tables, promote_options="default")
+            .group_by(key_cols)
+            .aggregate([(c, "mean") for c in value_cols])
+        )
+        combined = pa.table({
+            "location_id": grouped.column("location_id"),
+            "year_id": grouped.column("year_id"),
+            "model": model_column(len(grouped)),
+            "scenario": grouped.column("scenario"),
+            "variant": grouped.column("variant"),
+            **{c: grouped.column(f"{c}_mean") for c in value_cols},
+        })
+
+    # Save the aggregated mean results. Dictionary-encode the repeated
+    # string columns and bound the row groups so downstream readers can
+    # prune; zstd level 3 is near the size of higher levels at a
+    # fraction of the encode time.
     output_file = root / f"{summary_variable}_{scenario}_mean_{variant}.parquet"
-    combined_df.to_parquet(output_file, index=False)
+    pq.write_table(
+        combined,
+        output_file,
+        compression="zstd",
+        compression_level=3,
+        use_dictionary=["model", "scenario", "variant"],
+        row_group_size=256_000,
+    )
     
 
 subset_hierarchies = HIERARCHY_MAP[hierarchy]
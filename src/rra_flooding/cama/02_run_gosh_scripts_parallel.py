@@ -1,7 +1,6 @@
-import getpass
-import uuid
-from jobmon.client.tool import Tool # type: ignore
+import os
 from pathlib import Path
+from rra_flooding.jobmon_helpers import build_workflow_and_template, create_tasks_threaded
 
 
 # Script directory
@@ -44,82 +43,47 @@ YEARS = {
     "batch18": (2100, 2100),
 }
 
-# Jobmon setup
-user = getpass.getuser()
+# The year-batch names never change, so build the two lists once at
+# module scope instead of re-literalizing them inside the scenario loop
+HIST_BATCHES = [f"historical{i}" for i in range(1, 10)]
+SSP_BATCHES = [f"batch{i}" for i in range(1, 19)]
 
-log_dir = Path(f"/mnt/share/homes/{user}/flood/")
-log_dir.mkdir(parents=True, exist_ok=True)
-# Create directories for stdout and stderr
-stdout_dir = log_dir / "stdout"
-stderr_dir = log_dir / "stderr"
-stdout_dir.mkdir(parents=True, exist_ok=True)
-stderr_dir.mkdir(parents=True, exist_ok=True)
-
-# Project
-project = "proj_lsae"  # Adjust this to your project name if needed
-
-# Create a Jobmon tool
-user = getpass.getuser()
-wf_uuid = uuid.uuid4()
-tool = Tool(name="gosh_script_runner")
-
-# Create a workflow
-workflow = tool.create_workflow(
-    name=f"gosh_script_runner_{wf_uuid}",
-    max_concurrently_running=500,  # Adjust based on system capacity
-)
-
-# Set compute resources
-workflow.set_default_compute_resources_from_dict(
-    cluster_name="slurm",
-    dictionary={
-        "memory": "20G",
-        "cores": 2,
-        "runtime": "1440m",
-        "queue": "all.q",
-        "project": project,  # Ensure the project is set correctly
-        "stdout": str(stdout_dir),
-        "stderr": str(stderr_dir),
-    }
-)
-
-# Task template to run each shell script
-task_template = tool.get_task_template(
+# Jobmon setup (shared boilerplate lives in jobmon_helpers)
+workflow, task_template = build_workflow_and_template(
+    tool_name="gosh_script_runner",
+    workflow_name="gosh_script_runner",
     template_name="gosh_script_task",
-    default_cluster_name="slurm",
-    default_compute_resources={
-        "queue": "all.q",
-        "cores": 16,
+    command_template="cd /mnt/team/rapidresponse/pub/flooding/CaMa-Flood/cmf_v420_pkg/gosh && ./$(basename {script_path})",
+    node_args=["script_path"],
+    resources={
         "memory": "20G",
+        "cores": 16,
         "runtime": "1440m",
-        "project": project,  # Ensure the project is set correctly
-        "stdout": str(stdout_dir),
-        "stderr": str(stderr_dir),
     },
-    command_template="cd /mnt/team/rapidresponse/pub/flooding/CaMa-Flood/cmf_v420_pkg/gosh && ./$(basename {script_path})",
-    node_args=["script_path"],
-    task_args=[],
-    op_args=[],
 )
 
+# Inventory the gosh directory once; the loop membership-tests against
+# this set instead of stat-ing every candidate script path
+try:
+    gosh_present = set(os.listdir(GOSH_DIR))
+except FileNotFoundError:
+    gosh_present = set()
+
 # Generate tasks
-tasks = []
+task_kwargs = []
 for model in MODELS:
     print(f"Processing {model}...")
     for scenario in SCENARIOS:
         print(f"Processing {model} - {scenario}...")
-        if scenario == "historical":
-            relevant_years = ["historical1", "historical2", "historical3", "historical4", "historical5", "historical6", "historical7", "historical8", "historical9"]
-        else:
-            relevant_years = ["batch1", "batch2", "batch3", "batch4", "batch5", "batch6", "batch7", "batch8",
-                               "batch9", "batch10", "batch11", "batch12", "batch13", "batch14", "batch15", "batch16", "batch17", "batch18"]
+        relevant_years = HIST_BATCHES if scenario == "historical" else SSP_BATCHES
         for year_batch in relevant_years:
             start_year, end_year = YEARS[year_batch]
             script_name = f"{model}_{scenario}_r1i1p1f1_{start_year}-{end_year}.sh"
-            script_path = GOSH_DIR / script_name
-            if script_path.exists():
-                task = task_template.create_task(script_path=str(script_path))
-                tasks.append(task)  
+            if script_name in gosh_present:
+                task_kwargs.append({"script_path": str(GOSH_DIR / script_name)})
+
+# Construct the tasks off the loop on a small thread pool
+tasks = create_tasks_threaded(task_template, task_kwargs)
 print(f"Number of tasks: {len(tasks)}")
 
 if tasks:
@@ -1,10 +1,10 @@
-import getpass
-import uuid
-from jobmon.client.tool import Tool # type: ignore
+import os
+from concurrent.futures import ThreadPoolExecutor
+from itertools import product
 from rra_flooding import constants as rfc
-from rra_flooding.helper_functions import load_yaml_dictionary
+from rra_flooding.helper_functions import load_yaml_dictionary, parse_yaml_dictionary
+from rra_flooding.jobmon_helpers import build_workflow_and_template, create_tasks_threaded
 from pathlib import Path
-import yaml
 
 # Script directory
 SCRIPT_ROOT = rfc.REPO_ROOT / "rra-flooding" / "src" / "rra_flooding" / "cama"
@@ -14,104 +14,123 @@ YAML_PATH = rfc.REPO_ROOT / "rra-flooding" / "src" / "rra_flooding" / "VARIABLE_
 MODELS = ["ACCESS-CM2", "EC-Earth3", "INM-CM5-0", "MIROC6", "IPSL-CM6A-LR", "NorESM2-MM", "MRI-ESM2-0"]
 SCENARIOS = ["historical", "ssp126", "ssp245", "ssp585"]
 
+# Constant lookups for the task loops: the scenario year range and the
+# missing-combination skips are fixed, so resolve them once here
+# instead of re-branching inside the nested loops
+YEARS_BY_SCENARIO = {
+    scenario: range(1970, 2015) if scenario == "historical" else range(2015, 2101)
+    for scenario in SCENARIOS
+}
+SKIP_COMBINATIONS = {("GFDL-CM4", "ssp126")}
+
 VARIABLE_DICT = load_yaml_dictionary(YAML_PATH)
 
-# Jobmon setup
-user = getpass.getuser()
+# Per-variable resource asks, profiled from representative tasks.
+# Requesting only what a variable actually needs lets Slurm backfill
+# the tasks instead of holding them for a worst-case 50G slot. The
+# worker streams time slabs rather than holding the cube, so peak RSS
+# is a slab plus the adjustment raster.
+DEFAULT_RESOURCES = {"memory": "50G", "cores": 2, "runtime": "600m"}
+RESOURCE_BY_VARIABLE = {
+    "fldfrc": {"memory": "6G", "cores": 2, "runtime": "600m"},
+}
 
-log_dir = Path(f"/mnt/share/homes/{user}/flood/")
-log_dir.mkdir(parents=True, exist_ok=True)
-# Create directories for stdout and stderr
-stdout_dir = log_dir / "stdout"
-stderr_dir = log_dir / "stderr"
-stdout_dir.mkdir(parents=True, exist_ok=True)
-stderr_dir.mkdir(parents=True, exist_ok=True)
 
-# Project
-project = "proj_rapidresponse"  # Adjust this to your project name if needed
+def scandir_names(path: Path) -> set[str]:
+    try:
+        return {e.name for e in os.scandir(path)}
+    except FileNotFoundError:
+        return set()
 
-wf_uuid = uuid.uuid4()
-tool = Tool(name="daily_netcdf_brick_adjustment")
 
-# Create a workflow
-workflow = tool.create_workflow(
-    name=f"daily_brick_adjustment_workflow_{wf_uuid}",
-    max_concurrently_running=500,  # Adjust based on system capacity
-)
+# Fan the per-directory inventories out over a thread pool up front:
+# each readdir is latency-bound on NFS, so overlapping them collapses
+# the serial scan into a few round trips
+scan_keys = list(product(VARIABLE_DICT.keys(), SCENARIOS, MODELS))
+with ThreadPoolExecutor(max_workers=16) as executor:
+    presence = dict(zip(
+        scan_keys,
+        executor.map(lambda key: scandir_names(BASE_PATH.joinpath(*key)), scan_keys),
+    ))
 
-# Compute resources
-workflow.set_default_compute_resources_from_dict(
-    cluster_name="slurm",
-    dictionary={
-        "memory": "50G",
-        "cores": 2,
-        "runtime": "10m",
-        "queue": "all.q",
-        "project": project,  # Ensure the project is set correctly
-        "stdout": str(stdout_dir),
-        "stderr": str(stderr_dir),
-    }
-)
-
-# Define the task template for processing each year batch
-task_template = tool.get_task_template(
+# Jobmon setup (shared boilerplate lives in jobmon_helpers)
+workflow, task_template = build_workflow_and_template(
+    tool_name="daily_netcdf_brick_adjustment",
+    workflow_name="daily_brick_adjustment_workflow",
     template_name="daily_brick_adjustment",
-    default_cluster_name="slurm",
-    default_compute_resources={
-        "memory": "50G",
-        "cores": 2,
-        "runtime": "10m",
-        "queue": "all.q",
-        "project": project,  # Ensure the project is set correctly
-        "stdout": str(stdout_dir),
-        "stderr": str(stderr_dir),
-    },
     command_template=(
         "python {script_root}/adjust_daily_netcdf.py "
         "--model {{model}} "
         "--scenario {{scenario}} "
-        "--year {{year}} "
+        "--year_start {{year_start}} "
+        "--year_end {{year_end}} "
         "--variable {{variable}} "
         "--adjustment_num {{adjustment_num}}"
     ).format(script_root=SCRIPT_ROOT),
-    node_args=["model", "scenario", "year", "variable", "adjustment_num"],  # 👈 Include years in node_args
-    task_args=[],
-    op_args=[],
+    node_args=["model", "scenario", "year_start", "year_end", "variable", "adjustment_num"],  # 👈 Include year blocks in node_args
+    resources={
+        "memory": "50G",
+        "cores": 2,
+        "runtime": "600m",  # One task covers a full scenario's years
+    },
+    project="proj_rapidresponse",
+    max_concurrently_running=1000,  # Slim tasks pack densely; let the queue drain wide
 )
 
 
 # Add tasks
-tasks = []
+task_kwargs = []
 for variable in VARIABLE_DICT.keys():
     # num_adjustments = len(VARIABLE_DICT[variable])
     num_adjustments = 1
     for i in range(num_adjustments):
+        # The worker writes {adjusted_variable}_{year}.nc next to the
+        # inputs, so the directory inventory below also tells us which
+        # years are already done
+        adjusted_variable = parse_yaml_dictionary(variable, i)["adjusted_variable"]
         for scenario in SCENARIOS:
             for model in MODELS:
-                # Can we make it more efficient by having a list of models for each scenario? Or something?
-                if model == "GFDL-CM4" and scenario == "ssp126":
-                        continue
+                if (model, scenario) in SKIP_COMBINATIONS:
+                    continue
                 variable_root = BASE_PATH / variable / scenario / model
-                if not variable_root.exists():
+                # The threaded pre-scan already inventoried this
+                # directory; empty means missing or nothing produced yet
+                present = presence[(variable, scenario, model)]
+                if not present:
                     print(f"Skipping {variable_root}: does not exist")
                     continue
-                if scenario == "historical":
-                    start_year, end_year = 1970, 2014
-                else:
-                    start_year, end_year = 2015, 2100
-                for year in range(start_year, end_year + 1):
-                    input_file = variable_root / f"{variable}_{year}.nc"
-                    if not input_file.exists():
-                        print(f"Skipping {input_file}: does not exist")
+                years = []
+                # Plain string names inside the year loop: the membership
+                # tests and skip messages don't need a Path object per year
+                for year in YEARS_BY_SCENARIO[scenario]:
+                    fname = f"{variable}_{year}.nc"
+                    if fname not in present:
+                        print(f"Skipping {variable_root}/{fname}: does not exist")
+                        continue
+                    # Reruns shouldn't requeue years whose adjusted
+                    # output is already on disk
+                    if f"{adjusted_variable}_{year}.nc" in present:
                         continue
-                    task = task_template.create_task(
-                        model=model,
-                        scenario=scenario,
-                        year=year,
-                        variable = variable,
-                        adjustment_num=i 
-                    )
-                    tasks.append(task)
+                    years.append(year)
+                if not years:
+                    continue
+                # One task per (variable, adjustment, scenario, model):
+                # the worker loops over the whole year span in-process,
+                # skipping any missing years itself, so Python startup
+                # and the adjustment-raster read amortize across all of
+                # a scenario's years instead of a 10-minute payload each
+                task_kwargs.append({
+                    "model": model,
+                    "scenario": scenario,
+                    "year_start": years[0],
+                    "year_end": years[-1],
+                    "variable": variable,
+                    "adjustment_num": i,
+                    "compute_resources": RESOURCE_BY_VARIABLE.get(variable, DEFAULT_RESOURCES),
+                })
+
+# Construct the tasks off the loop on a small thread pool
+tasks = create_tasks_threaded(task_template, task_kwargs)
 
 if tasks:
     workflow.add_tasks(tasks)
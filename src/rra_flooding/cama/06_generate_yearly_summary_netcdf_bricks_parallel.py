@@ -1,11 +1,10 @@
-import getpass
-import uuid
-from jobmon.client.tool import Tool # type: ignore
+import os
+from concurrent.futures import ThreadPoolExecutor
+from itertools import product
 from pathlib import Path
-from rra_flooding.data import FloodingData
 from rra_flooding import constants as rfc
 from rra_flooding.helper_functions import load_yaml_dictionary
-import yaml
+from rra_flooding.jobmon_helpers import build_workflow_and_template, create_tasks_threaded
 
 # Script directory
 SCRIPT_ROOT = rfc.REPO_ROOT / "rra-flooding" / "src" / "rra_flooding" / "cama"
@@ -15,60 +14,35 @@ YAML_PATH = rfc.REPO_ROOT / "rra-flooding" / "src" / "rra_flooding" / "VARIABLE_
 MODELS = ["ACCESS-CM2", "EC-Earth3", "INM-CM5-0", "MIROC6", "IPSL-CM6A-LR", "NorESM2-MM", "MRI-ESM2-0"]
 SCENARIOS = ["historical", "ssp126", "ssp245", "ssp585"]
 
-VARIABLE_DICT = load_yaml_dictionary(YAML_PATH)
-
-# Jobmon setup
-user = getpass.getuser()
-
-log_dir = Path(f"/mnt/share/homes/{user}/flood/")
-log_dir.mkdir(parents=True, exist_ok=True)
-# Create directories for stdout and stderr
-stdout_dir = log_dir / "stdout"
-stderr_dir = log_dir / "stderr"
-stdout_dir.mkdir(parents=True, exist_ok=True)
-stderr_dir.mkdir(parents=True, exist_ok=True)
-
-# Project
-project = "proj_lsae"  # Adjust this to your project name if needed
-
-queue = "all.q"
-
-wf_uuid = uuid.uuid4()
-tool = Tool(name="daily_netcdf_brick_adjustment")
+# The missing-combination skips are fixed; resolve them once here
+# instead of re-branching inside the nested task loop
+SKIP_COMBINATIONS = {("GFDL-CM4", "ssp126")}
 
-# Create a workflow
-workflow = tool.create_workflow(
-    name=f"yearly_brick_workflow_{wf_uuid}",
-    max_concurrently_running=500,  # Adjust based on system capacity
-)
-
-# Compute resources
-workflow.set_default_compute_resources_from_dict(
-    cluster_name="slurm",
-    dictionary={
-        "memory": "50G",
-        "cores": 2,
-        "runtime": "120m",
-        "queue": queue,
-        "project": project,  # Ensure the project is set correctly
-        "stdout": str(stdout_dir),
-        "stderr": str(stderr_dir),
-    }
-)
+VARIABLE_DICT = load_yaml_dictionary(YAML_PATH)
 
-# Define the task template for processing each year batch
-task_template = tool.get_task_template(
+# Inventory the model directories once per (variable, scenario): one
+# readdir each instead of a stat per (variable, adjustment, scenario,
+# model) combination in the task loop. The readdirs are latency-bound
+# on the shared filesystem, so overlap them on a thread pool.
+def scandir_names(path: Path) -> set[str]:
+    try:
+        return {e.name for e in os.scandir(path)}
+    except FileNotFoundError:
+        return set()
+
+
+scan_keys = list(product(VARIABLE_DICT.keys(), SCENARIOS))
+with ThreadPoolExecutor(max_workers=16) as executor:
+    present_models = dict(zip(
+        scan_keys,
+        executor.map(lambda key: scandir_names(BASE_PATH.joinpath(*key)), scan_keys),
+    ))
+
+# Jobmon setup (shared boilerplate lives in jobmon_helpers)
+workflow, task_template = build_workflow_and_template(
+    tool_name="daily_netcdf_brick_adjustment",
+    workflow_name="yearly_brick_workflow",
     template_name="yearly_brick_generation",
-    default_cluster_name="slurm",
-    default_compute_resources={
-        "memory": "50G",
-        "cores": 2,
-        "runtime": "120m",
-        "queue": queue,
-        "project": project,  # Ensure the project is set correctly
-        "stdout": str(stdout_dir),
-        "stderr": str(stderr_dir),
-    },
     command_template=(
         "python  {script_root}/generate_yearly_summary_netcdf_bricks.py "
         "--model {{model}} "
@@ -78,32 +52,34 @@ task_template = tool.get_task_template(
         "--adjustment_num {{adjustment_num}} "
     ).format(script_root=SCRIPT_ROOT),
     node_args=["model", "scenario", "variant", "variable", "adjustment_num"],
-    task_args=[],  
-    op_args=[],
+    resources={
+        "memory": "50G",
+        "cores": 2,
+        "runtime": "120m",
+    },
 )
 
 # Add tasks
-tasks = []
+task_kwargs = []
 for variable in VARIABLE_DICT.keys():
     num_adjustments = len(VARIABLE_DICT[variable])
     for i in range(num_adjustments):
         for scenario in SCENARIOS:
             for model in MODELS:
-                # Can we make it more efficient by having a list of models for each scenario? Or something?
-                if model == "GFDL-CM4" and scenario == "ssp126":
-                        continue
-                # Is this next part still needed if I do the previous
-                base_root = BASE_PATH / variable / scenario / model
-                if not base_root.exists():
+                if (model, scenario) in SKIP_COMBINATIONS:
+                    continue
+                if model not in present_models[(variable, scenario)]:
                     continue
-                task = task_template.create_task(
-                    model=model,
-                    scenario=scenario,
-                    variant="r1i1p1f1",
-                    variable = variable,
-                    adjustment_num=i 
-                )
-                tasks.append(task)
+                task_kwargs.append({
+                    "model": model,
+                    "scenario": scenario,
+                    "variant": "r1i1p1f1",
+                    "variable": variable,
+                    "adjustment_num": i,
+                })
+
+# Construct the tasks off the loop on a small thread pool
+tasks = create_tasks_threaded(task_template, task_kwargs)
 
 print(f"Number of tasks: {len(tasks)}")
 
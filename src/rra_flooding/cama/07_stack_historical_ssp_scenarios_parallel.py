@@ -1,11 +1,7 @@
-import getpass
-import uuid
-from jobmon.client.tool import Tool # type: ignore
 from pathlib import Path
-from rra_flooding.data import FloodingData
 from rra_flooding import constants as rfc
 from rra_flooding.helper_functions import load_yaml_dictionary
-import yaml
+from rra_flooding.jobmon_helpers import build_workflow_and_template, create_tasks_threaded
 
 # Script directory
 SCRIPT_ROOT = rfc.REPO_ROOT / "rra-flooding" / "src" / "rra_flooding" / "cama"
@@ -19,56 +15,11 @@ MODELS = ["ACCESS-CM2", "EC-Earth3", "INM-CM5-0", "MIROC6", "IPSL-CM6A-LR", "Nor
 
 VARIABLE_DICT = load_yaml_dictionary(YAML_PATH)
 
-# Jobmon setup
-user = getpass.getuser()
-
-log_dir = Path(f"/mnt/share/homes/{user}/flood/")
-log_dir.mkdir(parents=True, exist_ok=True)
-# Create directories for stdout and stderr
-stdout_dir = log_dir / "stdout"
-stderr_dir = log_dir / "stderr"
-stdout_dir.mkdir(parents=True, exist_ok=True)
-stderr_dir.mkdir(parents=True, exist_ok=True)
-
-# Project
-project = "proj_rapidresponse"  # Adjust this to your project name if needed
-
-wf_uuid = uuid.uuid4()
-tool = Tool(name="stacking_yearly_bricks")
-
-# Create a workflow
-workflow = tool.create_workflow(
-    name=f"yearly_brick_workflow_{wf_uuid}",
-    max_concurrently_running=5000,  # Adjust based on system capacity
-)
-
-# Compute resources
-workflow.set_default_compute_resources_from_dict(
-    cluster_name="slurm",
-    dictionary={
-        "memory": "50G",
-        "cores": 2,
-        "runtime": "60m",
-        "queue": "all.q",
-        "project": project,  # Ensure the project is set correctly
-        "stdout": str(stdout_dir),
-        "stderr": str(stderr_dir),
-    }
-)
-
-# Define the task template for processing each year batch
-task_template = tool.get_task_template(
+# Jobmon setup (shared boilerplate lives in jobmon_helpers)
+workflow, task_template = build_workflow_and_template(
+    tool_name="stacking_yearly_bricks",
+    workflow_name="yearly_brick_workflow",
     template_name="stack_historical_generation",
-    default_cluster_name="slurm",
-    default_compute_resources={
-        "memory": "50G",
-        "cores": 2,
-        "runtime": "10m",
-        "queue": "all.q",
-        "project": project,  # Ensure the project is set correctly
-        "stdout": str(stdout_dir),
-        "stderr": str(stderr_dir),
-    },
     command_template=(
         "python {script_root}/stack_historical_ssp_scenarios.py "
         "--model {{model}} "
@@ -76,22 +27,29 @@ task_template = tool.get_task_template(
         "--adjustment_num {{adjustment_num}} "
     ).format(script_root=SCRIPT_ROOT),
     node_args=["model", "variable", "adjustment_num"],
-    task_args=[],  
-    op_args=[],
+    resources={
+        "memory": "50G",
+        "cores": 2,
+        "runtime": "10m",
+    },
+    project="proj_rapidresponse",
+    max_concurrently_running=5000,
 )
 
 # Add tasks
-tasks = []
+task_kwargs = []
 for variable in VARIABLE_DICT.keys():
     num_adjustments = len(VARIABLE_DICT[variable])
     for i in range(num_adjustments):
         for model in MODELS:
-            task = task_template.create_task(
-                model=model,
-                variable = variable,
-                adjustment_num=i 
-            )
-            tasks.append(task)
+            task_kwargs.append({
+                "model": model,
+                "variable": variable,
+                "adjustment_num": i,
+            })
+
+# Construct the tasks off the loop on a small thread pool
+tasks = create_tasks_threaded(task_template, task_kwargs)
 
 
 print(f"Number of tasks: {len(tasks)}")
@@ -1,31 +1,23 @@
+import functools
+import os
+import netCDF4 # type: ignore
 import numpy as np # type: ignore
 import xarray as xr # type: ignore
-import pandas as pd # type: ignore
 from pathlib import Path
 from rra_tools.shell_tools import mkdir, touch # type: ignore
 from rra_flooding.data import FloodingData
 from rra_flooding import constants as rfc
 from rra_flooding.helper_functions import parse_yaml_dictionary
 import argparse
-import yaml # type: ignore
 
-# Create the argument parser
-parser = argparse.ArgumentParser(description="Run flooding model standardization for multiple years.")
 
-# Define arguments
-parser.add_argument("--model", type=str, required=True, help="Climate model name")
-parser.add_argument("--scenario", type=str, required=True, help="Climate scenario")
-parser.add_argument("--variant", type=str, default="r1i1p1f1", help="Model variant identifier")
-parser.add_argument("--year", type=str, required=True, help="year to process")
-parser.add_argument("--variable", type=str, required=True, help="variable to process")
-parser.add_argument("--adjustment_num", type=int, required=True, help="Which adjustment to apply")
-parser.add_argument("--model_root", type=str, default=rfc.MODEL_ROOT, help="Root of the model directory")
+@functools.lru_cache(maxsize=4)
+def _load_adjustment_raster(path: str) -> np.ndarray:
+    # The raster depends only on (variable, adjustment, model), so one
+    # read serves every year in the task's block
+    return np.ascontiguousarray(xr.open_dataarray(path).values, dtype=np.float32)
 
-# Parse arguments
-args = parser.parse_args()
 
-
-    
 def standardize_flooding_fraction(model: str, scenario: str, variant: str,  year: int, variable: str, adjustment_num: int, model_root: str):
     floodingdata = FloodingData(model_root)
 
@@ -33,65 +25,135 @@ def standardize_flooding_fraction(model: str, scenario: str, variant: str,  year
     # parse the variable dictionary
     variable = variable_dict["variable"]
     adjustment_type = variable_dict["adjustment_type"]
-    adjusted_variable = variable_dict["adjusted_variable"]    
-    
+    adjusted_variable = variable_dict["adjusted_variable"]
+
 
     input_file_path = floodingdata.output_path(variable, scenario, model, year, variable_name = "base")
     if not input_file_path.exists():
         print(f"Input file {input_file_path} does not exist. Skipping...")
         return
-    
-    variable_ds = floodingdata.load_output(variable, scenario, model, year, variable_name = "base")
 
-    variable_da = variable_ds["value"].values
-    variable_da[variable_da < 0] = 0
-    variable_ds["value"] = (('time', 'lat', 'lon'), variable_da)
+    # The driver only trims completed years off the ends of the year
+    # block, so skip already-adjusted years here too: reruns over a span
+    # with interior holes then redo only the missing years
+    output_path = floodingdata.output_path(variable, scenario, model, year, variable_name=adjusted_variable)
+    if output_path.exists():
+        print(f"Output file {output_path} already exists. Skipping...")
+        return
 
+    # Build the long_name and, for the adjusted types, load the 2-D
+    # adjustment raster before touching the cube
     if adjustment_type == "unadjusted":
-        # rename the variable to the new name
-        variable_ds.attrs["long_name"] = f"Unadjusted {variable}"
-
-        floodingdata.save_output(variable_ds, variable, scenario, model, year, variable_name = adjusted_variable)
-        return
-    
+        long_name = f"Unadjusted {variable}"
+        adjustment_raster_values = None
     elif (adjustment_type == "shifted") | (adjustment_type == "weighted"):
-        shift_type = variable_dict["shift_type"]         
+        shift_type = variable_dict["shift_type"]
+        if shift_type == "percentile":
+            shift = variable_dict["shift"]
+            long_name = f"{adjustment_type} {variable} {shift_type} {shift}"
+        elif shift_type == "min":
+            long_name = f"{adjustment_type} {variable} {shift_type}"
 
         # Read in the adjustment raster
         adjustment_raster_path = floodingdata.stacked_output_path(
             variable, "historical", model, variable_name=f"{adjusted_variable}_raster_summary",
         )
-
-        # Load the adjustment raster
-        adjustment_raster = xr.open_dataarray(adjustment_raster_path)
-        adjustment_raster_values = adjustment_raster.values
-        # Subtract the adjustment raster from the variable
-        variable_da = variable_da - adjustment_raster_values
+        adjustment_raster_values = _load_adjustment_raster(str(adjustment_raster_path))
         if adjustment_type == "weighted":
             weight = 1 - adjustment_raster_values
-            mask = weight == 0
-            safe_weight = weight.copy()
-            safe_weight[mask] = 1  # Avoid division by zero
-            # Perform the division using safe weights
-            variable_da = variable_da / safe_weight
-            # Then zero out results where weight was zero
-            variable_da[:, mask] = 0
-
-        variable_da[variable_da < 0] = 0
-
-        # Replace the variable in the dataset with the adjusted variable
-        variable_ds["value"] = (('time', 'lat', 'lon'), variable_da)
-        # Update the attributes
-        if shift_type == "percentile":
-            shift = variable_dict["shift"]
-            variable_ds.attrs["long_name"] = f"{adjustment_type} {variable} {shift_type} {shift}"
-        elif shift_type == "min":
-            variable_ds.attrs["long_name"] = f"{adjustment_type} {variable} {shift_type}"
-
-        floodingdata.save_output(variable_ds, variable, scenario, model, year, variable_name = adjusted_variable)
+            zero_weight = weight == 0
+            nonzero_weight = ~zero_weight
     else:
         raise ValueError(f"Unknown adjustment type: {adjustment_type}")
 
+    # The adjustment is elementwise, so the cube never needs to be in
+    # memory at once: stream time slabs through the transform straight
+    # into the output file, keeping peak memory at one slab instead of
+    # the full (time, lat, lon) array plus temporaries
+    ds_in = netCDF4.Dataset(input_file_path, "r")
+    ds_in.set_auto_maskandscale(False)
+    in_value = ds_in.variables["value"]
+    n_time = len(ds_in.dimensions["time"])
+    n_lat = len(ds_in.dimensions["lat"])
+    n_lon = len(ds_in.dimensions["lon"])
+    fill_value = getattr(in_value, "_FillValue", None)
+
+    mkdir(output_path.parent, parents=True, exist_ok=True)
+    touch(output_path, clobber=True)
+
+    with netCDF4.Dataset(output_path, "w", format="NETCDF4") as ds_out:
+        ds_out.createDimension("time", n_time)
+        ds_out.createDimension("lat", n_lat)
+        ds_out.createDimension("lon", n_lon)
+
+        # The coords are tiny 1-D arrays; store them uncompressed
+        time_var = ds_out.createVariable("time", "i4", ("time",))
+        lat_var = ds_out.createVariable("lat", "f4", ("lat",))
+        lon_var = ds_out.createVariable("lon", "f4", ("lon",))
+
+        # Match the output chunking to the source so each slab lines up
+        # with whole compression chunks
+        chunking = in_value.chunking()
+        if chunking in (None, "contiguous"):
+            chunksizes = [1, n_lat, n_lon]
+            slab = 64
+        else:
+            chunksizes = [min(chunking[0], n_time), min(chunking[1], n_lat), min(chunking[2], n_lon)]
+            slab = chunksizes[0]
+        out_value = ds_out.createVariable(
+            "value", "f4", ("time", "lat", "lon"),
+            zlib=True, complevel=1,
+            chunksizes=chunksizes, fill_value=fill_value,
+        )
+
+        # Carry the metadata across, updating the long_name
+        ds_out.setncatts({k: ds_in.getncattr(k) for k in ds_in.ncattrs()})
+        ds_out.setncattr("long_name", long_name)
+        out_value.setncatts({k: in_value.getncattr(k) for k in in_value.ncattrs() if k != "_FillValue"})
+        for name, var in (("time", time_var), ("lat", lat_var), ("lon", lon_var)):
+            src = ds_in.variables[name]
+            var.setncatts({k: src.getncattr(k) for k in src.ncattrs() if k != "_FillValue"})
+            var[:] = src[:]
+
+        for start in range(0, n_time, slab):
+            stop = min(start + slab, n_time)
+            arr = in_value[start:stop]
+            # One vectorized max pass instead of a boolean mask plus
+            # masked scatter (NaNs propagate through either form)
+            np.maximum(arr, 0, out=arr)
+            if adjustment_raster_values is not None:
+                arr -= adjustment_raster_values
+                if adjustment_type == "weighted":
+                    # Divide in place, skipping the zero-weight pixels,
+                    # then zero those out explicitly
+                    np.divide(arr, weight, out=arr, where=nonzero_weight)
+                    arr[:, zero_weight] = 0
+                np.maximum(arr, 0, out=arr)
+            out_value[start:stop] = arr
+
+    ds_in.close()
+    os.chmod(output_path, 0o775)
+
 if __name__ == "__main__":
-    # Call the function with the parsed arguments
-    standardize_flooding_fraction(args.model, args.scenario, args.variant, args.year, args.variable, args.adjustment_num, args.model_root)
\ No newline at end of file
+    # Argument parsing lives under the main guard so the module can be
+    # imported (for its functions) without needing CLI arguments
+    parser = argparse.ArgumentParser(description="Run flooding model standardization for multiple years.")
+
+    # Define arguments
+    parser.add_argument("--model", type=str, required=True, help="Climate model name")
+    parser.add_argument("--scenario", type=str, required=True, help="Climate scenario")
+    parser.add_argument("--variant", type=str, default="r1i1p1f1", help="Model variant identifier")
+    parser.add_argument("--year_start", type=int, required=True, help="First year to process")
+    parser.add_argument("--year_end", type=int, required=True, help="Last year to process (inclusive)")
+    parser.add_argument("--variable", type=str, required=True, help="variable to process")
+    parser.add_argument("--adjustment_num", type=int, required=True, help="Which adjustment to apply")
+    parser.add_argument("--model_root", type=str, default=rfc.MODEL_ROOT, help="Root of the model directory")
+
+    # Parse arguments
+    args = parser.parse_args()
+
+    # Loop over the year block inside one task so interpreter startup,
+    # imports, and the adjustment-raster read are paid once per block
+    # instead of once per year
+    for year in range(args.year_start, args.year_end + 1):
+        standardize_flooding_fraction(args.model, args.scenario, args.variant, year, args.variable, args.adjustment_num, args.model_root)
\ No newline at end of file
@@ -47,8 +47,9 @@ def create_netcdf_file(model: str, scenario: str, variable: str, start_year: int
 
         # Reshape and handle NaNs
         data_array = binary_data.reshape((days_in_year, len(lat), len(lon)))
-        data_array[data_array >= 1e20] = nodata  # Catch all large values
-        data_array[np.isnan(data_array)] = nodata  # Catch NaNs explicitly
+        # One comparison catches both sentinels and NaNs (NaN < 1e20 is
+        # False), halving the passes over the ~1.5 GB array
+        data_array[~(data_array < 1e20)] = nodata
 
         # Create xarray Dataset
         ds = xr.Dataset( # Have this be variable_ds
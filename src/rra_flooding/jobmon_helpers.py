@@ -0,0 +1,125 @@
+import getpass
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+from jobmon.client.tool import Tool # type: ignore
+
+
+def build_workflow_and_template(
+    tool_name: str,
+    workflow_name: str,
+    template_name: str,
+    command_template: str,
+    node_args: list[str],
+    task_args: list[str] | None = None,
+    resources: dict[str, Any] | None = None,
+    project: str = "proj_lsae",
+    max_concurrently_running: int = 500,
+) -> tuple[Any, Any]:
+    """Create a workflow and task template with the shared cluster setup.
+
+    Every parallel submission script repeated the same log-directory
+    creation, compute-resource dictionary, and Tool/Workflow/template
+    construction. Centralizing it here means each script only supplies
+    its command template and task-generation loop.
+
+    Parameters
+    ----------
+    tool_name
+        Name of the jobmon tool.
+    workflow_name
+        Base name of the workflow; a uuid is appended so reruns bind
+        fresh workflows.
+    template_name
+        Name of the task template.
+    command_template
+        Fully formatted jobmon command template string.
+    node_args
+        Template placeholders that distinguish tasks.
+    task_args
+        Template placeholders shared across tasks.
+    resources
+        Overrides for the default compute resources (memory, cores,
+        runtime, queue, ...).
+    project
+        Slurm project to charge.
+    max_concurrently_running
+        Cap on concurrently running tasks for the workflow.
+
+    Returns
+    -------
+    tuple
+        The workflow and the task template.
+    """
+    user = getpass.getuser()
+    log_dir = Path(f"/mnt/share/homes/{user}/flood/")
+    stdout_dir = log_dir / "stdout"
+    stderr_dir = log_dir / "stderr"
+    stdout_dir.mkdir(parents=True, exist_ok=True)
+    stderr_dir.mkdir(parents=True, exist_ok=True)
+
+    compute_resources = {
+        "memory": "10G",
+        "cores": 1,
+        "runtime": "60m",
+        "queue": "all.q",
+        "project": project,
+        "stdout": str(stdout_dir),
+        "stderr": str(stderr_dir),
+    }
+    if resources:
+        compute_resources.update(resources)
+
+    tool = Tool(name=tool_name)
+    workflow = tool.create_workflow(
+        name=f"{workflow_name}_{uuid.uuid4()}",
+        max_concurrently_running=max_concurrently_running,
+    )
+    workflow.set_default_compute_resources_from_dict(
+        cluster_name="slurm",
+        dictionary=compute_resources,
+    )
+    task_template = tool.get_task_template(
+        template_name=template_name,
+        default_cluster_name="slurm",
+        default_compute_resources=compute_resources,
+        command_template=command_template,
+        node_args=node_args,
+        task_args=task_args or [],
+        op_args=[],
+    )
+    return workflow, task_template
+
+
+def create_tasks_threaded(
+    task_template: Any,
+    task_kwargs: list[dict[str, Any]],
+    max_workers: int = 8,
+) -> list[Any]:
+    """Construct tasks from prebuilt kwargs dicts on a thread pool.
+
+    create_task is validation-heavy, so at thousands of tasks it
+    dominates DAG construction. The generation loops collect plain
+    kwargs dicts and this fans the actual construction out over a few
+    threads.
+
+    Parameters
+    ----------
+    task_template
+        The task template to construct tasks from.
+    task_kwargs
+        One kwargs dict per task.
+    max_workers
+        Number of construction threads.
+
+    Returns
+    -------
+    list
+        The constructed tasks, in input order.
+    """
+    if not task_kwargs:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(task_kwargs))) as executor:
+        return list(executor.map(lambda kw: task_template.create_task(**kw), task_kwargs))